@@ -1,16 +1,27 @@
 import os
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import numpy as np
+import pyarrow as pa
 import time
 from datetime import datetime, timezone, timedelta
-from urllib.parse import quote
 import re
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
 from email import encoders
-import glob
+import argparse
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import orjson  # Parser JSON en C, mucho más rápido que json estándar
+except ImportError:
+    orjson = None
 
 # Configuración segura desde secretos
 TOKEN = os.getenv("API_TOKEN")
@@ -23,190 +34,324 @@ APP_PASSWORD = os.getenv("APP_PASSWORD")
 EMAIL_DESTINO = os.getenv("CORREO_DESTINO")
 
 MAX_RETRIES = 0
-REQUEST_DELAY = 15
 RETRY_DELAY = 10
+MAX_WORKERS = 4  # Consultas simultáneas contra la API
+WRITER_WORKERS = 2  # Hilos que guardan archivos mientras continúan las consultas
+RATE_LIMIT = 10  # Solicitudes permitidas a la API...
+RATE_PERIOD = 60  # ...por cada ventana de este número de segundos
 
-# ENDPOINTS
-ENDPOINTS = {
-    "Transacciones de materiales": "System.MaterialTransactions.List.View1",
-    "Conciliacion de inventario": "Ardisa.InventoryReconciliation.List.View2",
-    "Inventario de materiales": "System.InventoryItems.List.View4",
-    "Entregas de salida": "System.OutboundDeliveries.List.View1",
-    "Salida de mercancia": "System.GoodsIssues.List.View1",
-    "Entradas de mercancia": "System.GoodsRecipts.List.View1",
-    "Envios entrantes": "Ardisa.InboundDeliveries.List.View1",
-    "Documentos OV/FR/ST": "Ardisa.SalesOrders.List.View1",
-    "Tareas": "System.Tasks.List.View3",
-    "Inventario Ciclico": "System.StockCountingItemVars.List.View1"
-}
-
-# Configuración de las consultas
-QUERY_CONFIG = [
-    {
-        "name": "Transacciones de materiales",
-        "params": {
-            "orderby": "ctxn_transaction_date desc",
-            "take": "10000",
-            "where": "ctxn_transaction_date = current_date - 1"
-        }
-    },
-    {
-        "name": "Conciliacion de inventario",
-        "params": {
-            "orderby": "snap_date desc",
-            "take": "10000",
-            "where": "snap_date = current_date - 1"
-        }
-    },
-    {
-        "name": "Inventario de materiales",
-        "params": {
-            "take": "20000"
-        }
-    },
-    {
-        "name": "Entregas de salida",
-        "params": {
-            "orderby": "codv_created_on desc",
-            "take": "1000",
-            "where": "(codv_created_on > current_date - 7) and (codv_created_on < current_date - 6)"
-        }
-    },
-    {
-        "name": "Salida de mercancia",
-        "params": {
-            "orderby": "cgis_created_on desc",
-            "take": "1000",
-            "where": "(cgis_created_on > current_date - 1) and (cgis_created_on < current_date)"
-        }
-    },
-    {
-        "name": "Entradas de mercancia",
-        "params": {
-            "orderby": "cgre_created_on desc",
-            "take": "1000",
-            "where": "(cgre_created_on > current_date - 7) and (cgre_created_on < current_date - 6)"
-        }
-    },
-    {
-        "name": "Envios entrantes",
-        "params": {
-            "orderby": "cdoc_created_on desc",
-            "take": "1000",
-            "where": "(cdoc_created_on > current_date - 7) and (cdoc_created_on < current_date - 6)"
-        }
-    },
-    {
-        "name": "Documentos OV/FR/ST",
-        "params": {
-            "orderby": "cslo_created_on desc",
-            "take": "1000",
-            "where": "(cslo_created_on > current_date - 7) and (cslo_created_on< current_date - 6)"
-        }
-    },
-    {
-        "name": "Tareas",
-        "params": {
-            "orderby": "ctsk_created_on desc",
-            "take": "5000",
-            "where": "(ctsk_created_on > current_date - 7) and (ctsk_created_on < current_date - 6)"
-        }
-    },
-    {
-        "name": "Inventario Ciclico",
-        "params": {
-            "orderby": "DocDate desc",
-            "take": "5000",
-            "where": "DocDate = current_date - 1 and ItemClosed ilike 'SI'"
-        }
-    }
-]
+# Sesión HTTP compartida (keep-alive y pool de conexiones)
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+# Caché local de respuestas en <carpeta de salida>/.cache, desactivada por defecto
+# (se activa con --cache). En GitHub Actions cada ejecución empieza sin caché, así que allí no aporta
+CACHE_SUBDIR = ".cache"
+DEFAULT_CACHE_TTL = 600  # Segundos de vigencia cuando la consulta no define "ttl"
+CACHE_RETENTION = 7 * 24 * 3600  # Las copias vencidas se conservan este tiempo para revalidarlas con ETag
+
+# Formato de los archivos generados: "csv" (por defecto) o "parquet".
+# El workflow sube como artifact tanto data/*.csv como data/*.parquet
+OUTPUT_FORMATS = ("csv", "parquet")
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "csv").lower()  # Se valida al inicio de run()
+
+# Saltos de línea, retornos de carro y espacios consecutivos
+# (como texto: el kernel regex de Arrow no acepta patrones compilados de Python).
+# En RE2 \s solo cubre [\t\n\f\r ]; se amplía para igualar el \s Unicode de Python
+# (\v, separadores \x1c-\x1f, NEL \x85 y separadores Unicode como \xa0 o U+2028)
+_WS_PATTERN = r'[\s\v\x1c-\x1f\x85\p{Z}]+'
+_WS_RE = re.compile(r'\s+')  # Equivalente en Python, si la columna no se puede pasar a Arrow
+
+# Archivo de configuración (endpoints y consultas) y carpeta de salida por defecto
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "powerbi_backup.json")
+OUTPUT_DIR = "data"
+
+# Los mensajes se emiten desde varios hilos (consultas y escritura)
+_LOG_LOCK = threading.Lock()
+
+def log(message):
+    """Imprime un mensaje completo sin que se mezcle con los de otros hilos"""
+    with _LOG_LOCK:
+        print(message, flush=True)
+
+class ResponseCache:
+    """Caché en disco de DataFrames por URL con tiempo de expiración y validadores HTTP"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(url):
+        return hashlib.md5(url.encode("utf-8")).hexdigest()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _entry(self, url):
+        with self.lock:
+            return self._load_index().get(self._key(url))
+
+    def get(self, url, allow_stale=False):
+        """Devuelve el DataFrame guardado para la URL si aún está vigente (o siempre, con allow_stale)"""
+        entry = self._entry(url)
+        if not entry or (not allow_stale and entry["expires_at"] <= time.time()):
+            return None
+        try:
+            return pd.read_pickle(entry["path"])
+        except Exception:
+            return None
+
+    def validators(self, url):
+        """Cabeceras condicionales (If-None-Match / If-Modified-Since) para revalidar la URL"""
+        entry = self._entry(url)
+        if not entry or not os.path.exists(entry["path"]):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def _evict(index, key, path):
+        """Quita del índice (y del disco) la copia anterior de `key` y las vencidas hace tiempo"""
+        old = index.get(key)
+        if old and old.get("path") != path:
+            stale_paths = [old.get("path")]
+        else:
+            stale_paths = []
+        limit = time.time() - CACHE_RETENTION
+        for other_key, entry in list(index.items()):
+            if other_key != key and entry.get("expires_at", 0) < limit:
+                stale_paths.append(entry.get("path"))
+                del index[other_key]
+        for stale_path in stale_paths:
+            if stale_path:
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+
+    def set(self, url, df, ttl, etag=None, last_modified=None):
+        """Guarda el DataFrame de la URL durante `ttl` segundos junto con sus validadores HTTP"""
+        if ttl <= 0:
+            return
+        key = self._key(url)
+        path = os.path.join(self.directory, f"{key}.pkl")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            df.to_pickle(path)
+            with self.lock:
+                index = self._load_index()
+                self._evict(index, key, path)
+                index[key] = {
+                    "expires_at": time.time() + ttl,
+                    "path": path,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                }
+                with open(self.index_path, "w", encoding="utf-8") as f:
+                    json.dump(index, f)
+        except OSError as e:
+            log(f"⚠️  No se pudo guardar en caché: {e}")
+
+class RateLimiter:
+    """Limitador token bucket: permite `rate` solicitudes cada `per` segundos"""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Espera solo si no quedan tokens disponibles"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate / self.per)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.per / self.rate
+            time.sleep(wait)
+
+LIMITER = RateLimiter(RATE_LIMIT, RATE_PERIOD)
 
 def get_colombia_time():
     """Obtiene la fecha y hora actual en zona horaria de Colombia (UTC-5)"""
     colombia_time = datetime.now(timezone(timedelta(hours=-5)))
     return colombia_time - timedelta(days=1)
 
-def build_url(endpoint, params):
-    param_parts = []
-    for key, value in params.items():
-        encoded_value = quote(str(value))
-        param_parts.append(f"{key}={encoded_value}")
-    url = f"{BASE_URL}{endpoint}?{'&'.join(param_parts)}"
-    return url
-
 def sanitize_filename(name):
     """Convierte un nombre a formato seguro para nombres de archivo"""
     return re.sub(r'[\\/*?:"<>|]', "_", name)
 
-def clean_string(value):
-    """Limpia strings reemplazando saltos de línea y retornos de carro"""
-    if isinstance(value, str):
-        # Reemplazar saltos de línea y retornos de carro con espacios
-        value = value.replace('\r\n', ' ').replace('\n', ' ').replace('\r', ' ')
-        # Eliminar espacios múltiples consecutivos
-        value = re.sub(r'\s+', ' ', value).strip()
-    return value
-
 def clean_dataframe(df):
     """Limpia todos los campos string del DataFrame"""
     for column in df.columns:
-        if df[column].dtype == 'object':  # Columnas que contienen strings
-            df[column] = df[column].apply(clean_string)
+        if pd.api.types.is_string_dtype(df[column].dtype):
+            # Reemplazar saltos de línea, retornos de carro y espacios múltiples por un espacio.
+            # Solo los textos pasan a Arrow; las columnas numéricas conservan su tipo y formato
+            try:
+                values = df[column].astype("string[pyarrow]")
+            except (OverflowError, pa.ArrowException):
+                df[column] = df[column].map(
+                    lambda value: _WS_RE.sub(" ", value).strip() if isinstance(value, str) else value
+                )
+                continue
+            df[column] = values.str.replace(_WS_PATTERN, " ", regex=True).str.strip()
     return df
 
-def fetch_data(url, name):
-    print(f"\n🔗 URL generada para {name}:\n{url}\n")
+def parse_json(response):
+    """Decodifica el cuerpo JSON de la respuesta, usando orjson si está disponible"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def add_query_metadata(df):
+    """Agrega la columna metadata_fecha_consulta con la fecha y hora colombiana"""
+    # Categórica: el texto se guarda una sola vez, con un código int8 por fila
+    colombia_time = get_colombia_time()
+    fecha_consulta = colombia_time.strftime("%Y-%m-%d %H:%M:%S")
+    df["metadata_fecha_consulta"] = pd.Categorical.from_codes(
+        np.zeros(len(df), dtype="int8"), categories=[fecha_consulta]
+    )
+    return df
+
+def parse_datetime_columns(df, datetime_columns):
+    """Convierte columnas de fecha con su formato explícito (evita la inferencia lenta de pandas)"""
+    for column, fmt in datetime_columns.items():
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format=fmt, cache=True, errors="coerce")
+    return df
+
+def fetch_data(endpoint, params, name, cache=None, ttl=DEFAULT_CACHE_TTL, columns=None, datetime_columns=None):
+    url = f"{BASE_URL}{endpoint}"
+    # URL final (la misma que enviará requests); falla si API_BASE_URL falta o es inválida
+    try:
+        full_url = requests.Request("GET", url, params=params).prepare().url
+    except requests.exceptions.RequestException as e:
+        log(f"⚠️  Error en {name}: {e}\n❌ La consulta {name} fracasó definitivamente.")
+        return None
+    log(f"\n🔗 URL generada para {name}:\n{full_url}\n")
+    # Las opciones que transforman el DataFrame guardado forman parte de la clave de caché
+    options = {key: value for key, value in (("columns", columns), ("datetime_columns", datetime_columns)) if value}
+    cache_key = f"{full_url}#{json.dumps(options, sort_keys=True)}" if options else full_url
+    use_cache = cache is not None and ttl > 0
+    conditional_headers = {}
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            log(f"📦 Caché HIT para {name}")
+            return add_query_metadata(cached)
+        log(f"📦 Caché MISS para {name}")
+        # Revalidar la copia vencida: si no cambió, la API responde 304 sin cuerpo
+        conditional_headers = cache.validators(cache_key)
     for attempt in range(MAX_RETRIES + 1):
         try:
-            print(f"🔎 Consultando {name} (Intento {attempt + 1}/{MAX_RETRIES + 1})")
-            response = requests.get(url, headers=HEADERS, timeout=60)
+            LIMITER.acquire()
+            log(f"🔎 Consultando {name} (Intento {attempt + 1}/{MAX_RETRIES + 1})")
+            response = SESSION.get(url, params=params, headers=conditional_headers, timeout=60)
+            if use_cache and response.status_code == 304:
+                df = cache.get(cache_key, allow_stale=True)
+                if df is None:
+                    log(f"⚠️  {name} respondió 304 pero no hay copia en caché.")
+                    return None
+                log(f"📦 {name} sin cambios (HTTP 304), se reutiliza la copia en caché")
+                df = add_query_metadata(df)
+                cache.set(
+                    cache_key, df, ttl,
+                    etag=response.headers.get("ETag") or conditional_headers.get("If-None-Match"),
+                    last_modified=response.headers.get("Last-Modified") or conditional_headers.get("If-Modified-Since"),
+                )
+                return df
             response.raise_for_status()
-            data = response.json()
+            data = parse_json(response)
             
             if not data:
-                print(f"⚠️  {name} no devolvió datos (JSON vacío).")
+                log(f"⚠️  {name} no devolvió datos (JSON vacío).")
                 return None
                 
             if isinstance(data, dict) and data.get("error"):
-                print(f"⚠️  Error en {name}: {data.get('error')}")
+                log(f"⚠️  Error en {name}: {data.get('error')}")
                 return None
             
             # Extraer solo el array "message" de la respuesta
             if isinstance(data, dict) and "message" in data:
                 message_data = data["message"]
                 if not message_data:
-                    print(f"⚠️  {name} no tiene datos en el array 'message'.")
+                    log(f"⚠️  {name} no tiene datos en el array 'message'.")
                     return None
-                df = pd.DataFrame(message_data)
+                # Construir solo las columnas configuradas (todas si no hay lista)
+                df = pd.DataFrame(message_data, columns=columns)
             else:
-                print(f"⚠️  La respuesta de {name} no contiene el array 'message'.")
+                log(f"⚠️  La respuesta de {name} no contiene el array 'message'.")
                 return None
                 
+            # Convertir fechas con formato conocido antes de limpiar los textos
+            if datetime_columns:
+                df = parse_datetime_columns(df, datetime_columns)
+
             # Limpiar los datos (remover saltos de línea)
             df = clean_dataframe(df)
                 
             # Agregar metadata con fecha y hora colombiana
-            colombia_time = get_colombia_time()
-            df["metadata_fecha_consulta"] = colombia_time.strftime("%Y-%m-%d %H:%M:%S")
+            df = add_query_metadata(df)
+            if use_cache:
+                cache.set(
+                    cache_key, df, ttl,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
             return df
         except requests.exceptions.RequestException as e:
-            print(f"⚠️  Error en {name}: {e}")
+            log(f"⚠️  Error en {name}: {e}")
             if attempt < MAX_RETRIES:
-                print(f"⏳ Reintentando en {RETRY_DELAY}s...")
+                log(f"⏳ Reintentando en {RETRY_DELAY}s...")
                 time.sleep(RETRY_DELAY)
             else:
-                print(f"❌ La consulta {name} fracasó definitivamente.")
+                log(f"❌ La consulta {name} fracasó definitivamente.")
                 return None
         except ValueError as e:
-            print(f"⚠️  Error al decodificar JSON en {name}: {e}")
+            log(f"⚠️  Error al decodificar JSON en {name}: {e}")
             return None
         except KeyError as e:
-            print(f"⚠️  Error al procesar la estructura JSON en {name}: {e}")
+            log(f"⚠️  Error al procesar la estructura JSON en {name}: {e}")
             return None
 
-def save_data(df, query_name):
-    os.makedirs("data", exist_ok=True)
+def load_config(path):
+    """Carga los endpoints y las consultas desde un archivo JSON"""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return config["endpoints"], config["queries"]
+
+def run_query(query, endpoints, cache=None):
+    """Ejecuta una consulta de la configuración y descarga sus datos"""
+    name = query["name"]
+    log(f"\n🔍 Ejecutando consulta: {name}\n📋 Parámetros: {query['params']}")
+    return fetch_data(
+        endpoints[name], query["params"], name,
+        cache=cache,
+        ttl=query.get("ttl", DEFAULT_CACHE_TTL),
+        columns=query.get("columns"),
+        datetime_columns=query.get("datetime_columns"),
+    )
+
+def save_data(df, query_name, output_dir=OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
     
     # Obtener fecha y hora colombiana para el nombre del archivo
     colombia_time = get_colombia_time()
@@ -214,28 +359,29 @@ def save_data(df, query_name):
     
     # Crear nombre de archivo seguro usando el nombre de la consulta
     safe_query_name = sanitize_filename(query_name)
-    filename = f"{safe_query_name}_{timestamp}.csv"
-    path = os.path.join("data", filename)
+    filename = f"{safe_query_name}_{timestamp}.{OUTPUT_FORMAT}"
+    path = os.path.join(output_dir, filename)
     
-    # Guardar como CSV con encoding UTF-8
-    # Reemplace encoding= 'utf-8') por encoding='utf-8-sig', na_rep='')
-    df.to_csv(path, index=False, encoding='utf-8-sig', na_rep='')
-    print(f"💾 Guardado: {path} - {len(df)} registros")
+    if OUTPUT_FORMAT == "parquet":
+        # Parquet columnar comprimido (requiere pyarrow)
+        df.to_parquet(path, engine="pyarrow", compression="snappy", index=False)
+    else:
+        # Guardar como CSV con encoding UTF-8
+        # Reemplace encoding= 'utf-8') por encoding='utf-8-sig', na_rep='')
+        df.to_csv(path, index=False, encoding='utf-8-sig', na_rep='')
+    log(f"💾 Guardado: {path} - {len(df)} registros")
     
     return path
 
-def send_email_with_attachments():
-    """Envía los archivos CSV por correo sin comprimir"""
+def send_email_with_attachments(output_files):
+    """Envía por correo, sin comprimir, los archivos generados en esta ejecución"""
     if not all([EMAIL_ORIGEN, APP_PASSWORD, EMAIL_DESTINO]):
-        print("⚠️  Faltan credenciales de correo. No se enviará el email.")
+        log("⚠️  Faltan credenciales de correo. No se enviará el email.")
         return False
     
     try:
-        # Buscar todos los archivos CSV en la carpeta data
-        csv_files = glob.glob("data/*.csv")
-        
-        if not csv_files:
-            print("⚠️  No hay archivos CSV para enviar.")
+        if not output_files:
+            log("⚠️  No hay archivos para enviar.")
             return False
         
         # Configurar el mensaje de correo
@@ -251,8 +397,8 @@ def send_email_with_attachments():
         body = "Copia de base de datos realizada con éxito"
         msg.attach(MIMEText(body, 'plain'))
         
-        # Adjuntar todos los archivos CSV
-        for file_path in csv_files:
+        # Adjuntar todos los archivos generados
+        for file_path in output_files:
             filename = os.path.basename(file_path)
             attachment = open(file_path, "rb")
             
@@ -263,7 +409,7 @@ def send_email_with_attachments():
             
             msg.attach(part)
             attachment.close()
-            print(f"📎 Adjuntando: {filename}")
+            log(f"📎 Adjuntando: {filename}")
         
         # Enviar correo
         server = smtplib.SMTP('smtp.gmail.com', 587)
@@ -273,59 +419,84 @@ def send_email_with_attachments():
         server.sendmail(EMAIL_ORIGEN, EMAIL_DESTINO, text)
         server.quit()
         
-        print("✅ Correo enviado exitosamente")
+        log("✅ Correo enviado exitosamente")
         return True
         
     except Exception as e:
-        print(f"❌ Error al enviar correo: {e}")
+        log(f"❌ Error al enviar correo: {e}")
         return False
 
-def delete_csv_files():
-    """Elimina todos los archivos CSV de la carpeta data"""
+def delete_output_files(output_files):
+    """Elimina los archivos generados en esta ejecución"""
     try:
-        csv_files = glob.glob("data/*.csv")
-        for file_path in csv_files:
+        for file_path in output_files:
             os.remove(file_path)
-            print(f"🗑️  Eliminado: {file_path}")
+            log(f"🗑️  Eliminado: {file_path}")
         
-        print(f"✅ Se eliminaron {len(csv_files)} archivos CSV")
+        log(f"✅ Se eliminaron {len(output_files)} archivos")
         return True
     except Exception as e:
-        print(f"❌ Error al eliminar archivos: {e}")
+        log(f"❌ Error al eliminar archivos: {e}")
         return False
 
-def main():
-    print("🚀 Iniciando consultas para Power BI")
+def run(endpoints, query_config, output_dir=OUTPUT_DIR, use_cache=False):
+    """Ejecuta las consultas, guarda los resultados en output_dir y los envía por correo"""
+    # Validar antes de consultar la API, para no descargar datos que no se podrán guardar
+    if OUTPUT_FORMAT not in OUTPUT_FORMATS:
+        raise ValueError(f"OUTPUT_FORMAT inválido: {OUTPUT_FORMAT!r} (use {' o '.join(OUTPUT_FORMATS)})")
+    log("🚀 Iniciando consultas para Power BI")
     start_time = time.time()
+    cache = ResponseCache(os.path.join(output_dir, CACHE_SUBDIR)) if use_cache else None
 
-    # Ejecutar consultas y guardar datos
-    for query in QUERY_CONFIG:
-        name = query["name"]
-        endpoint = ENDPOINTS[name]
-        url = build_url(endpoint, query["params"])
-        print(f"\n🔍 Ejecutando consulta: {name}")
-        print(f"📋 Parámetros: {query['params']}")
-        df = fetch_data(url, name)
-        if df is not None:
-            print(f"📊 Datos obtenidos: {len(df)} registros")
-            save_data(df, name)
-        else:
-            print(f"❌ No se obtuvieron datos para {name}")
-        time.sleep(REQUEST_DELAY)
+    # Ejecutar consultas en paralelo y guardar datos en segundo plano a medida que llegan
+    writes = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
+            ThreadPoolExecutor(max_workers=WRITER_WORKERS) as writer:
+        futures = {
+            executor.submit(run_query, query, endpoints, cache): query["name"]
+            for query in query_config
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                # Un error inesperado en una consulta no debe detener las demás
+                log(f"⚠️  Error inesperado en {name}: {e}")
+                df = None
+            if df is not None:
+                log(f"📊 Datos obtenidos para {name}: {len(df)} registros")
+                writes.append(writer.submit(save_data, df, name, output_dir))
+            else:
+                log(f"❌ No se obtuvieron datos para {name}")
+
+    # Rutas de los archivos escritos en esta ejecución (propaga errores de escritura).
+    # Solo estos se envían y se eliminan, aunque la carpeta de salida contenga otros
+    output_files = [write.result() for write in writes]
 
     # Enviar archivos por correo
-    print("\n📤 Enviando archivos por correo...")
-    email_sent = send_email_with_attachments()
+    log("\n📤 Enviando archivos por correo...")
+    email_sent = send_email_with_attachments(output_files)
     
     # Eliminar archivos después de enviar el correo
     if email_sent:
-        print("\n🗑️  Eliminando archivos CSV...")
-        delete_csv_files()
+        log("\n🗑️  Eliminando archivos generados...")
+        delete_output_files(output_files)
     else:
-        print("⚠️  Los archivos no se eliminaron porque el correo no se envió correctamente")
+        log("⚠️  Los archivos no se eliminaron porque el correo no se envió correctamente")
 
     duration = time.time() - start_time
-    print(f"✅ Proceso finalizado en {duration:.2f} segundos.")
+    log(f"✅ Proceso finalizado en {duration:.2f} segundos.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Descarga consultas de la API para Power BI")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Archivo JSON con endpoints y consultas")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Carpeta donde se guardan los archivos")
+    parser.add_argument("--cache", action="store_true", help="Reutiliza resultados recientes guardados en <output-dir>/.cache")
+    args = parser.parse_args()
+
+    endpoints, query_config = load_config(args.config)
+    run(endpoints, query_config, args.output_dir, use_cache=args.cache)
 
 if __name__ == "__main__":
     main()